@@ -0,0 +1,45 @@
+"""
+Numba-compiled Braille scan for k6braille.
+
+scan_masks decodes all six Braille cells of a 6x6 grid of color ids for
+every set of colors that could be turned on.  k6braille imports it only
+when asked to (-numba), and otherwise does the same scan with numpy.
+"""
+
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True)
+def scan_masks(grid_ids, num_colors, lut):
+    """
+    Letter ids of every cell of grid_ids, for every mask of on colors.
+
+    Parameters
+    ----------
+    grid_ids : uint8 array of shape (6, 6)
+        Color id of each grid position.
+    num_colors : int
+        Number of color ids; masks run over 0..2**num_colors - 1.
+    lut : int8 array of length 64
+        Letter id (0..25, or -1 for no letter) of each packed cell, with
+        dot d in bit d-1.
+
+    Returns
+    -------
+    int8 array of shape (2**num_colors, 6)
+        Row mask holds the letter ids of the cells in reading order:
+        top row left to right, then bottom row.
+    """
+    out = np.empty((1 << num_colors, 6), np.int8)
+    for mask in range(1 << num_colors):
+        for cell in range(6):
+            r = 3 * (cell // 3)
+            c = 2 * (cell % 3)
+            idx = 0
+            for dr in range(3):
+                for dc in range(2):
+                    if (mask >> grid_ids[r + dr, c + dc]) & 1:
+                        idx |= 1 << (dr + 3 * dc)
+            out[mask, cell] = lut[idx]
+    return out
@@ -0,0 +1,145 @@
+"""
+Numba-compiled enumeration kernel for the edge-coloring solver.
+
+This is the same iterative bitmask backtracking search, branching on the
+most constrained edge, as colortrade_tools._iter_colorings, written
+against plain integer arrays so Numba can compile it to machine code.
+colortrade_tools imports it only when called with use_numba=True.
+
+Vertices are renumbered 0..n-1 and colors 0..62, so a vertex's color set
+fits in one int64 bitmask.
+"""
+
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True)
+def popcount(x):
+    count = 0
+    while x:
+        x &= x - 1
+        count += 1
+    return count
+
+
+@njit(cache=True)
+def enumerate_colorings(eu, ev, allowed_mask, deg, pivot):
+    """
+    Enumerate colorings, returning the color id of every edge of each one.
+
+    Parameters
+    ----------
+    eu, ev : int32 arrays of length m
+        Endpoints of each edge, as vertex indices.
+    allowed_mask : int64 array of length n
+        Bitmask of the colors required at each vertex.
+    deg : int32 array of length n
+        Degree of each vertex.
+    pivot : int
+        Vertex whose edges may only take its lowest remaining color, or -1.
+
+    Returns
+    -------
+    int32 array of shape (n_solutions, m)
+        Row i holds the color ids of solution i.  The rows are collected
+        in a buffer that doubles when full, so the search runs only once.
+    """
+    m = eu.shape[0]
+    n = allowed_mask.shape[0]
+    remaining = allowed_mask.copy()
+    colored_incident = np.zeros(n, np.int32)
+    edge = np.zeros(m, np.int32)      # edge being colored at each depth
+    choice = np.zeros(m, np.int64)    # color bit assigned at each depth, 0 if none
+    cand = np.zeros(m, np.int64)      # colors not yet tried at each depth
+    uncolored = np.ones(m, np.bool_)  # edges not on the stack
+    num_solutions = 0
+    out = np.empty((64, m), np.int32)
+
+    if m == 0:
+        for w in range(n):
+            if remaining[w] != 0:
+                return out[:0]
+        return out[:1]
+
+    d = 0
+    descend = True
+    while d >= 0:
+        if descend:
+            # Branch on the uncolored edge with the fewest candidate colors
+            best_k = -1
+            best_cand = 0
+            best_count = 64
+            for k in range(m):
+                if not uncolored[k]:
+                    continue
+                c = remaining[eu[k]] & remaining[ev[k]]
+                if eu[k] == pivot or ev[k] == pivot:
+                    c &= remaining[pivot] & -remaining[pivot]
+                count = popcount(c)
+                if count < best_count:
+                    best_k = k
+                    best_cand = c
+                    best_count = count
+                    if count <= 1:
+                        break
+            edge[d] = best_k
+            cand[d] = best_cand
+            uncolored[best_k] = False
+            descend = False
+
+        k = edge[d]
+        u = eu[k]
+        v = ev[k]
+
+        b = choice[d]
+        if b != 0:
+            colored_incident[u] -= 1
+            colored_incident[v] -= 1
+            remaining[u] |= b
+            remaining[v] |= b
+            choice[d] = 0
+
+        c = cand[d]
+        if c == 0:
+            uncolored[k] = True
+            d -= 1
+            continue
+
+        b = c & -c
+        cand[d] = c ^ b
+
+        choice[d] = b
+        remaining[u] ^= b
+        remaining[v] ^= b
+        colored_incident[u] += 1
+        colored_incident[v] += 1
+
+        if (popcount(remaining[u]) > deg[u] - colored_incident[u] or
+                popcount(remaining[v]) > deg[v] - colored_incident[v]):
+            continue
+
+        if d + 1 == m:
+            complete = True
+            for w in range(n):
+                if remaining[w] != 0:
+                    complete = False
+                    break
+            if complete:
+                if num_solutions == out.shape[0]:
+                    grown = np.empty((2 * out.shape[0], m), np.int32)
+                    grown[:num_solutions] = out
+                    out = grown
+                for j in range(m):
+                    x = choice[j]
+                    c_id = 0
+                    while x > 1:
+                        x >>= 1
+                        c_id += 1
+                    out[num_solutions, edge[j]] = c_id
+                num_solutions += 1
+        else:
+            d += 1
+            descend = True
+
+    return out[:num_solutions]
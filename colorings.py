@@ -9,7 +9,6 @@ Draws all solutions satisfying constraints.
 import sys
 import os
 import argparse
-import matplotlib.pyplot as plt
 import networkx as nx
 import colortrade_tools as ct
 from collections import Counter
@@ -29,14 +28,24 @@ def parse_args():
                         help="Print latex tikz code to draw the numbered coloring")
     
     return parser.parse_args()
+
+def import_pyplot():
+    """matplotlib is only needed for drawing, and is slow to import."""
+    try:
+        import matplotlib.pyplot as plt
+    except ImportError:
+        sys.exit("colorings: -showall and -tradegraph need matplotlib")
+    return plt
+
 args = parse_args()
 
 g = ct.EdgeColoringInstance.from_json(args.filename)
-sols = g.solve()
-tg = ct.build_trade_graph(sols)
+# Keep the colorings packed; decode them to dicts only for output
+bits, edges, colors = g.solve_packed()
+tg = ct.build_trade_graph(bits)
  
 print("Color trade graph")
-print("Total colorings (= # of vertices):", len(sols))
+print("Total colorings (= # of vertices):", len(bits))
 print("Total swaps (= # of edges):", tg.number_of_edges())
 sizes = sorted((len(c) for c in nx.connected_components(tg)), reverse=True)
 print("Number of components:", len(sizes))
@@ -50,19 +59,22 @@ for degree in sorted(spectrum):
 
 # TeX output if requested
 if args.latex is not None:
-    if int(args.latex) not in range(len(sols)):
+    if int(args.latex) not in range(len(bits)):
         print('latex:',args.latex,'is not a numbered coloring.')
     else:
-        print(g.draw_latex(sols[int(args.latex)]))
+        [sol] = ct.unpack_solutions(bits[int(args.latex)], edges, colors)
+        print(g.draw_latex(sol))
     
 # Display solutions
 if args.showall:
-    g.draw_colorings(sols)
+    plt = import_pyplot()
+    g.draw_colorings(ct.unpack_solutions(bits, edges, colors))
     plt.gcf().canvas.manager.set_window_title("All colorings")
     plt.show()
 
 # Find the color trade graph and show it
 if args.tradegraph:
+    plt = import_pyplot()
     plt.figure(num = "Color trade graph")
     nx.draw(tg, with_labels=True)
     plt.show()
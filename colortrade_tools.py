@@ -63,9 +63,11 @@ custom backtracking solver, and displayed with NetworkX.
 Dependencies
 ------------
     • networkx
-    • matplotlib
+    • numpy
     • math
     • json (standard library)
+    • matplotlib (only for the drawing functions)
+    • numba (optional, for the compiled solver in _solver_numba.py)
 
 Example
 -------
@@ -80,117 +82,403 @@ Basically this was written by ChatGPT 5.1, with a little help from Bryan Clair.
 """
 
 import math
-import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle
 import json
 import networkx as nx
-from itertools import combinations
+import numpy as np
+from functools import lru_cache
 
-def all_edge_colorings_with_vertex_constraints(G, vertex_colors):
+def _iter_colorings(eu, ev, remaining_mask, deg, pivot=-1):
     """
-    Enumerate all proper edge colorings of G such that for each vertex v:
-      - incident edges use exactly the colors in vertex_colors[v]
-      - no two edges incident to v share a color (proper edge-coloring condition)
-    
-    Parameters
-    ----------
-    G : networkx.Graph
-        Simple undirected graph.
-    vertex_colors : dict
-        Mapping v -> iterable of colors. Colors are any hashable objects.
-        Must satisfy: degree(v) == len(set(vertex_colors[v])).
-    
-    Returns
-    -------
-    list of dict
-        Each element is a dict mapping edges (u, v) to colors.
-        Edges are keyed exactly as in G.edges().
+    Backtracking search behind all_edge_colorings_with_vertex_constraints.
+
+    Edge k joins vertex indices eu[k] and ev[k]; remaining_mask[w] is the
+    bitmask of color ids required at vertex w and deg[w] its degree.
+    remaining_mask is used as scratch space and restored on return.
+    If pivot is a vertex index, each edge at the pivot may only take the
+    lowest color the pivot still needs (see the canonical option).
+    Yields each solution as a list of color ids in edge order.  The same
+    list is reused for every solution, so copy it to keep it.
+
+    At every step the search branches on the uncolored edge with the
+    fewest candidate colors, taking the lowest edge index on ties, so the
+    given edge order serves as the static fallback order.
+    """
+    m = len(eu)
+    pivot_edge = [pivot in (u, v) for u, v in zip(eu, ev)]
+    colored_incident = [0] * len(deg)  # how many incident edges are already colored
+
+    edge_colors = [0] * m  # edge index -> color id
+    if m == 0:
+        if not any(remaining_mask):
+            yield edge_colors
+        return
+
+    # Iterative backtracking.  At depth d, edge_stack[d] is the edge being
+    # colored, cand_stack[d] holds the colors not yet tried on it and
+    # bit_stack[d] the color currently assigned to it (0 if none), so
+    # undoing a level needs no saved frame.  uncolored is a bitset of the
+    # edges not on the stack.
+    edge_stack = [0] * m
+    cand_stack = [0] * m
+    bit_stack = [0] * m
+    uncolored = (1 << m) - 1
+    d = 0
+    descend = True
+    while d >= 0:
+        if descend:
+            # Pick the uncolored edge with the fewest available colors
+            # (colors still unused at both endpoints); stop early at one with none.
+            best_count = m + 64
+            x = uncolored
+            while x:
+                eb = x & -x
+                x ^= eb
+                k = eb.bit_length() - 1
+                cand = remaining_mask[eu[k]] & remaining_mask[ev[k]]
+                if pivot_edge[k]:
+                    cand &= remaining_mask[pivot] & -remaining_mask[pivot]
+                count = cand.bit_count()
+                if count < best_count:
+                    best_k, best_cand, best_count = k, cand, count
+                    if count <= 1:
+                        break
+            edge_stack[d] = best_k
+            cand_stack[d] = best_cand
+            uncolored ^= 1 << best_k
+            descend = False
+
+        k = edge_stack[d]
+        u = eu[k]
+        v = ev[k]
+
+        # Undo the previous assignment at this depth, if any
+        b = bit_stack[d]
+        if b:
+            colored_incident[u] -= 1
+            colored_incident[v] -= 1
+            remaining_mask[u] |= b
+            remaining_mask[v] |= b
+            bit_stack[d] = 0
+
+        cand = cand_stack[d]
+        if not cand:
+            # dead end, or all colors tried
+            uncolored |= 1 << k
+            d -= 1
+            continue
+
+        # Properness is already guaranteed by remaining_mask:
+        # we never allow a color already used at a vertex.
+        b = cand & -cand
+        cand_stack[d] = cand ^ b
+
+        # Assign color bit b to edge (u, v)
+        bit_stack[d] = b
+        edge_colors[k] = b.bit_length() - 1
+        remaining_mask[u] ^= b
+        remaining_mask[v] ^= b
+        colored_incident[u] += 1
+        colored_incident[v] += 1
+
+        # Forward-check: there must be enough incident edges left to place all remaining colors
+        if (remaining_mask[u].bit_count() > deg[u] - colored_incident[u] or
+                remaining_mask[v].bit_count() > deg[v] - colored_incident[v]):
+            continue
+
+        if d + 1 == m:
+            # All edges are colored; check that every vertex has used all its colors
+            if not any(remaining_mask):
+                yield edge_colors
+        else:
+            d += 1
+            descend = True
+
+# CPython refuses to compile more than 20 statically nested loops
+_MAX_SPECIALIZED_EDGES = 20
+
+@lru_cache(maxsize=None)
+def _specialized_search(eu, ev, remaining_mask, pivot=-1):
+    """
+    Compile a search function specialized to one instance.
+
+    Generates Python source with one nested `while` loop per edge (in the
+    given order, at most _MAX_SPECIALIZED_EDGES edges), with every vertex
+    mask held in a local variable and every index fixed, then compiles it.
+    Calling the result returns a list of solutions, each a tuple of color
+    bits in edge order.  Arguments are tuples so the compiled function is
+    cached for repeated solves of the same instance.
+
+    Since each vertex has exactly deg(v) colors and each colored edge uses
+    one, the forward check of _iter_colorings always holds here and is
+    left out; dead ends show up as an empty candidate mask.
+    """
+    m = len(eu)
+    lines = ["def _search():", "    sols = []"]
+    lines += [f"    r{w} = {mask}" for w, mask in enumerate(remaining_mask)]
+    for d in range(m):
+        ind = "    " * (d + 1)
+        u, v = eu[d], ev[d]
+        cand = f"r{u} & r{v}"
+        if pivot in (u, v):
+            cand += f" & r{pivot} & -r{pivot}"
+        lines += [f"{ind}c{d} = {cand}",
+                  f"{ind}while c{d}:",
+                  f"{ind}    b{d} = c{d} & -c{d}",
+                  f"{ind}    c{d} ^= b{d}"]
+        if d + 1 < m:
+            lines.append(f"{ind}    r{u} ^= b{d}; r{v} ^= b{d}")
+    if m:
+        ind = "    " * (m + 1)
+        lines.append(f"{ind}sols.append(({', '.join(f'b{d}' for d in range(m))},))")
+        for d in reversed(range(m - 1)):
+            ind = "    " * (d + 2)
+            lines.append(f"{ind}r{eu[d]} ^= b{d}; r{ev[d]} ^= b{d}")
+    else:
+        lines.append("    sols.append(())")
+    lines.append("    return sols")
+
+    namespace = {}
+    exec(compile("\n".join(lines) + "\n", "<specialized edge-coloring search>", "exec"), namespace)
+    return namespace["_search"]
+
+def _branching_order(eu, ev, remaining_mask):
     """
+    Static most-constrained-first order for the edges of the search.
 
+    Greedily picks next the edge with the most already-ordered edges at
+    its endpoints (those endpoints have the fewest colors left by then),
+    breaking ties by the fewest colors shared by its endpoints.  Sorting
+    on shared colors alone scatters the search across the graph and
+    weakens the forward check, so adjacency comes first.
+    """
+    placed = [0] * len(remaining_mask)
+    left = set(range(len(eu)))
+    order = []
+    while left:
+        k = min(left, key=lambda k: (-(placed[eu[k]] + placed[ev[k]]),
+                                     (remaining_mask[eu[k]] & remaining_mask[ev[k]]).bit_count(),
+                                     k))
+        order.append(k)
+        left.remove(k)
+        placed[eu[k]] += 1
+        placed[ev[k]] += 1
+    return order
+
+def _prepare_search(G, vertex_colors, edges, deg, node_idx, canonical):
+    """
+    Validate an instance and set up the integer arrays for the search.
+
+    Returns (edges, color_list, eu, ev, remaining_mask, deg, pivot,
+    position): color ids index color_list, eu/ev and deg are in search
+    order, and position[k] is the search index of edges[k].
+    """
     # Basic sanity checks
     if set(G.nodes()) != set(vertex_colors.keys()):
         raise ValueError("vertex_colors must define a color list for every vertex in G")
 
     allowed = {v: set(cs) for v, cs in vertex_colors.items()}
 
+    if edges is None:
+        edges = list(G.edges())
+    if deg is None:
+        deg = dict(G.degree())
+    if node_idx is None:
+        node_idx = {v: i for i, v in enumerate(G.nodes())}
+    elif (set(node_idx) != set(G.nodes()) or
+          sorted(node_idx.values()) != list(range(len(node_idx)))):
+        raise ValueError("node_idx must number the vertices of G 0..n-1")
+    m = len(edges)
+
     # Degree / constraint consistency
     for v in G.nodes():
-        deg = G.degree(v)
         colors_v = allowed[v]
         if len(colors_v) != len(vertex_colors[v]):
             raise ValueError(f"Duplicate colors in constraint for vertex {v}")
-        if deg != len(colors_v):
+        if deg[v] != len(colors_v):
             raise ValueError(
-                f"Degree/constraint mismatch at v={v}: deg={deg}, "
+                f"Degree/constraint mismatch at v={v}: deg={deg[v]}, "
                 f"|colors|={len(colors_v)}"
             )
 
-    edges = list(G.edges())
-    m = len(edges)
+    # Give every color a bit and every vertex an index, so the per-vertex
+    # color sets below are plain ints: intersection is &, popcount is bit_count().
+    all_colors = set().union(*allowed.values())
+    color_list = sorted(all_colors)
+    color_id = {c: i for i, c in enumerate(color_list)}
+    nodes = sorted(node_idx, key=node_idx.__getitem__)
+    eu = [node_idx[u] for u, v in edges]
+    ev = [node_idx[v] for u, v in edges]
 
     # Per-vertex bookkeeping
-    deg = dict(G.degree())
-    remaining_colors = {v: set(allowed[v]) for v in G.nodes()}
-    used_colors = {v: set() for v in G.nodes()}
-    colored_incident = {v: 0 for v in G.nodes()}  # how many incident edges are already colored
+    deg = [deg[v] for v in nodes]
+    remaining_mask = [sum(1 << color_id[c] for c in allowed[v]) for v in nodes]
+
+    # With identical color lists everywhere, permuting the colors maps
+    # colorings to colorings; fixing the order of colors at one vertex
+    # picks one coloring from each class.
+    pivot = -1
+    if canonical:
+        if len(set(remaining_mask)) > 1:
+            raise ValueError("canonical=True needs every vertex to have the same color list")
+        if m:
+            pivot = eu[0]
+
+    # Branch on the most constrained edges first.  position[k] is where
+    # edge k (in G.edges() order) sits in the search order.
+    order = _branching_order(eu, ev, remaining_mask)
+    eu = [eu[k] for k in order]
+    ev = [ev[k] for k in order]
+    position = [0] * m
+    for j, k in enumerate(order):
+        position[k] = j
+
+    return edges, color_list, eu, ev, remaining_mask, deg, pivot, position
+
+def all_edge_colorings_with_vertex_constraints(G, vertex_colors, use_numba=False,
+                                               edges=None, deg=None, node_idx=None,
+                                               canonical=False, specialize=False):
+    """
+    Enumerate all proper edge colorings of G such that for each vertex v:
+      - incident edges use exactly the colors in vertex_colors[v]
+      - no two edges incident to v share a color (proper edge-coloring condition)
+    
+    Parameters
+    ----------
+    G : networkx.Graph
+        Simple undirected graph.
+    vertex_colors : dict
+        Mapping v -> iterable of colors. Colors are any hashable objects
+        that can be sorted together (e.g. all strings or all integers).
+        Must satisfy: degree(v) == len(set(vertex_colors[v])).
+    use_numba : bool
+        Run the search in the Numba-compiled kernel from _solver_numba
+        (requires numba, and at most 63 distinct colors).
+        The first call in a fresh cache pays the compile time.
+    edges, deg, node_idx : optional
+        Precomputed list(G.edges()), dict(G.degree()) and a {node: index}
+        numbering of the vertices as 0..n-1 (as cached by
+        EdgeColoringInstance), to skip rebuilding them.
+    canonical : bool
+        Return one coloring per class of colorings that differ only by a
+        permutation of the colors.  Only allowed when every vertex has the
+        same color list, say of k colors; each class then has exactly k!
+        members, so the full count is k! times the number returned.  The
+        returned coloring is the one whose edges at the first vertex take
+        the colors in sorted order.
+    specialize : bool
+        Run the search as Python code generated for this particular graph
+        (see _specialized_search), compiled once and cached.  Ignored for
+        graphs with more than _MAX_SPECIALIZED_EDGES edges.
+    
+    Returns
+    -------
+    list of dict
+        Each element is a dict mapping edges (u, v) to colors.
+        Edges are keyed exactly as in G.edges().
+    """
 
-    edge_colors = {}  # (u, v) -> color
-    solutions = []
+    edges, color_list, eu, ev, remaining_mask, deg, pivot, position = _prepare_search(
+        G, vertex_colors, edges, deg, node_idx, canonical)
+    m = len(edges)
 
-    def backtrack(edge_index):
-        if edge_index == m:
-            # All edges are colored; check that every vertex has used all its colors
-            if all(len(remaining_colors[v]) == 0 for v in G.nodes()):
-                solutions.append(dict(edge_colors))
-            return
-
-        u, v = edges[edge_index]
-
-        # Available colors for this edge = colors still unused at both endpoints
-        possible_colors = remaining_colors[u] & remaining_colors[v]
-        if not possible_colors:
-            return  # dead end
-
-        for c in possible_colors:
-            # Properness is already guaranteed by remaining_colors/used_colors:
-            # we never allow a color already used at a vertex.
-            # Assign c to edge (u, v)
-            edge_key = (u, v)
-            edge_colors[edge_key] = c
-
-            used_colors[u].add(c)
-            used_colors[v].add(c)
-            remaining_colors[u].remove(c)
-            remaining_colors[v].remove(c)
-            colored_incident[u] += 1
-            colored_incident[v] += 1
-
-            # Forward-check: there must be enough incident edges left to place all remaining colors
-            ok = True
-            for w in (u, v):
-                uncolored_edges_at_w = deg[w] - colored_incident[w]
-                if len(remaining_colors[w]) > uncolored_edges_at_w:
-                    ok = False
-                    break
-
-            if ok:
-                backtrack(edge_index + 1)
-
-            # Undo assignment
-            colored_incident[u] -= 1
-            colored_incident[v] -= 1
-            remaining_colors[u].add(c)
-            remaining_colors[v].add(c)
-            used_colors[u].remove(c)
-            used_colors[v].remove(c)
-            del edge_colors[edge_key]
+    if use_numba:
+        # numba is slow to import, so only load the kernel when asked for
+        try:
+            from _solver_numba import enumerate_colorings as _enumerate_colorings_numba
+        except ImportError:
+            raise ImportError("use_numba=True requires numba")
+        if len(color_list) > 63:
+            raise ValueError("use_numba=True supports at most 63 distinct colors")
+        args = (np.array(eu, dtype=np.int32), np.array(ev, dtype=np.int32),
+                np.array(remaining_mask, dtype=np.int64), np.array(deg, dtype=np.int32))
+        solutions = _enumerate_colorings_numba(*args, pivot).tolist()
+    elif specialize and m <= _MAX_SPECIALIZED_EDGES:
+        search = _specialized_search(tuple(eu), tuple(ev), tuple(remaining_mask), pivot)
+        solutions = [[b.bit_length() - 1 for b in sol] for sol in search()]
+    else:
+        solutions = [list(sol) for sol in _iter_colorings(eu, ev, remaining_mask, deg, pivot)]
 
-    backtrack(0)
+    # Translate color ids back to the caller's colors, keyed as in G.edges()
+    solutions = [{e: color_list[sol[position[k]]] for k, e in enumerate(edges)}
+                 for sol in solutions]
     # order canonically
     solutions.sort(key=lambda d: tuple(sorted(d.items())))
     return solutions
 
-def draw_edge_coloring(G, coloring, layout=None, node_size=600, width=3):
+def all_edge_colorings_packed(G, vertex_colors, edges=None, deg=None, node_idx=None,
+                              canonical=False):
+    """
+    Like all_edge_colorings_with_vertex_constraints, but return the colorings
+    packed into bit-vectors instead of dicts, in the same order.
+
+    Each coloring is written straight from the search into a row of a
+    uint64 array (grown by doubling), so no per-edge dict is ever built.
+    Bit k*C + c of a row is set iff edges[k] has color colors[c], with
+    C = len(colors); see pack_solutions.  The array can be passed directly
+    to build_trade_graph, and unpack_solutions turns rows back into dicts.
+
+    Returns
+    -------
+    bits : numpy.ndarray of uint64, shape (n_solutions, nwords)
+    edges : list
+        The edges, in G.edges() order.
+    colors : list
+        The sorted colors.
+    """
+    edges, color_list, eu, ev, remaining_mask, deg, pivot, position = _prepare_search(
+        G, vertex_colors, edges, deg, node_idx, canonical)
+    m = len(edges)
+    C = len(color_list)
+    nwords = (m * C + 63) // 64
+    sorted_edges = sorted(range(m), key=lambda k: edges[k])
+
+    bits = np.zeros((16, nwords), dtype=np.uint64)
+    keys = []
+    for sol in _iter_colorings(eu, ev, remaining_mask, deg, pivot):
+        ids = [sol[position[k]] for k in range(m)]
+        packed = 0
+        for k, c in enumerate(ids):
+            packed |= 1 << (k * C + c)
+        if len(keys) == len(bits):
+            bits = np.resize(bits, (2 * len(bits), nwords))
+        bits[len(keys)] = np.frombuffer(packed.to_bytes(nwords * 8, "little"), dtype="<u8")
+        # Sort key matching the dict solver's order: the color ids read in
+        # sorted-edge order, as one base-C number.
+        key = 0
+        for k in sorted_edges:
+            key = key * C + ids[k]
+        keys.append(key)
+
+    bits = bits[:len(keys)]
+    return bits[sorted(range(len(keys)), key=keys.__getitem__)], edges, color_list
+
+def unpack_solutions(bits, edges, colors):
+    """
+    Decode rows of all_edge_colorings_packed output back into solution dicts.
+    """
+    C = len(colors)
+    solutions = []
+    for row in np.atleast_2d(bits):
+        packed = int.from_bytes(row.astype("<u8").tobytes(), "little")
+        solutions.append({e: colors[((packed >> (k * C)) & ((1 << C) - 1)).bit_length() - 1]
+                          for k, e in enumerate(edges)})
+    return solutions
+
+def _edge_color_map(colors):
+    """
+    Map each color to something matplotlib accepts.  Strings like "red" or
+    "blue" map to themselves; if all colors are numbers they are spread
+    over the tab10 colormap in sorted order.
+    """
+    colors = set(colors)
+    if all(isinstance(c, (int, float)) for c in colors):
+        import matplotlib.pyplot as plt
+        cmap = plt.cm.tab10
+        return {c: cmap(i % 10) for i, c in enumerate(sorted(colors))}
+    return {c: c for c in colors}
+
+def draw_edge_coloring(G, coloring, layout=None, node_size=600, width=3, edges=None,
+                       color_map=None):
     """
     Draw a graph G with edges colored according to the dictionary `coloring`.
 
@@ -205,36 +493,31 @@ def draw_edge_coloring(G, coloring, layout=None, node_size=600, width=3):
     node_size : int
     width : float
         Edge width.
+    edges : list (optional)
+        Precomputed list(G.edges()), to skip rebuilding it.
+    color_map : dict (optional)
+        Precomputed color -> matplotlib color mapping (see _edge_color_map).
     """
 
+    # matplotlib is slow to import, so only drawing code loads it
+    import matplotlib.pyplot as plt
+
     if layout is None:
         layout = nx.spring_layout(G, seed=1)
 
-    # Convert colors to something matplotlib accepts
-    # If colors are strings like "red" or "blue" this works automatically.
-    # If they are integers, convert them to a matplotlib colormap.
-    edge_colors = []
-
-    # Determine if colors are numeric
-    vals = list(coloring.values())
-    numeric = all(isinstance(c, (int, float)) for c in vals)
+    if edges is None:
+        edges = list(G.edges())
 
-    if numeric:
-        # Map integers to a colormap (tab10 will give distinct colors)
-        # You can switch to any discrete colormap you prefer.
-        cmap = plt.cm.tab10
-        unique_vals = sorted(set(vals))
-        color_map = {c: cmap(i % 10) for i, c in enumerate(unique_vals)}
-        edge_colors = [color_map[coloring[e]] for e in G.edges()]
-    else:
-        # Assume strings or valid matplotlib colors
-        edge_colors = [coloring[e] for e in G.edges()]
+    # Convert colors to something matplotlib accepts
+    if color_map is None:
+        color_map = _edge_color_map(coloring.values())
+    edge_colors = [color_map[coloring[e]] for e in edges]
 
     # Draw nodes
     nx.draw_networkx_nodes(G, layout, node_size=node_size, node_color="lightgray", edgecolors="black")
 
     # Draw edges
-    nx.draw_networkx_edges(G, layout, width=width, edge_color=edge_colors)
+    nx.draw_networkx_edges(G, layout, edgelist=edges, width=width, edge_color=edge_colors)
 
     # Draw labels
     nx.draw_networkx_labels(G, layout, font_size=12)
@@ -295,7 +578,8 @@ def tikz_from_coloring(G, coloring, layout, scale = 1.0, node_style="CTnode", ed
     lines.append(r"\end{tikzpicture}")
     return "\n".join(lines)
 
-def draw_all_edge_colorings(G, solutions, node_size=600, width=3, layout=None):
+def draw_all_edge_colorings(G, solutions, node_size=600, width=3, layout=None, edges=None,
+                            color_map=None):
     """
     Draw all edge-colorings in the list `solutions` using matplotlib subplots.
 
@@ -313,6 +597,11 @@ def draw_all_edge_colorings(G, solutions, node_size=600, width=3, layout=None):
     layout : dict or None
         Optional fixed layout dictionary {node: (x, y)}.
         If None, spring_layout is used once and reused for all subplots.
+    edges : list or None
+        Optional precomputed list(G.edges()), reused for every subplot.
+    color_map : dict or None
+        Optional precomputed color -> matplotlib color mapping.  If None,
+        it is built once from the colors used in all solutions.
 
     Notes
     -----
@@ -321,18 +610,30 @@ def draw_all_edge_colorings(G, solutions, node_size=600, width=3, layout=None):
         • integers (mapped to a tab10 colormap)
     """
 
+    import matplotlib.pyplot as plt
+
     if not solutions:
         print("No solutions to draw.")
         return
 
     if len(solutions) == 1:
         # Delegate to the single-solution helper, passing arguments along
-        draw_edge_coloring(G, solutions[0], node_size=node_size, width=width, layout=layout)
+        draw_edge_coloring(G, solutions[0], node_size=node_size, width=width, layout=layout,
+                           edges=edges, color_map=color_map)
         return
 
     # Use a consistent layout across all drawings.
     if layout is None:
         layout = nx.spring_layout(G, seed=1)
+    if edges is None:
+        edges = list(G.edges())
+
+    # Nodes and labels are the same in every subplot; only edges vary.
+    # Work out their positions once and draw them with plain scatter/text
+    # calls rather than through the networkx wrappers.
+    nodes = list(G.nodes())
+    node_xy = np.array([layout[v] for v in nodes], dtype=float).reshape(len(nodes), 2)
+    node_labels = [(x, y, str(v)) for v, (x, y) in zip(nodes, node_xy.tolist())]
 
     n = len(solutions)
     cols = math.ceil(math.sqrt(n))
@@ -341,27 +642,22 @@ def draw_all_edge_colorings(G, solutions, node_size=600, width=3, layout=None):
     fig, axes = plt.subplots(rows, cols, figsize=(4 * cols, 4 * rows))
     axes = axes.flatten()
 
+    # The palette is the same for every solution, so work it out once.
+    if color_map is None:
+        color_map = _edge_color_map({c for solution in solutions for c in solution.values()})
+
     for ax_index, (solution, ax) in enumerate(zip(solutions, axes)):
         plt.sca(ax)
         ax.set_title(f"Solution {ax_index}", fontsize=12)
 
-        # Determine whether colors are numeric
-        vals = list(solution.values())
-        numeric = all(isinstance(c, (int, float)) for c in vals)
-
-        if numeric:
-            cmap = plt.cm.tab10
-            unique_vals = sorted(set(vals))
-            color_map = {c: cmap(i % 10) for i, c in enumerate(unique_vals)}
-            edge_colors = [color_map[solution[e]] for e in G.edges()]
-        else:
-            # assume matplotlib-friendly strings
-            edge_colors = [solution[e] for e in G.edges()]
+        edge_colors = [color_map[solution[e]] for e in edges]
 
-        nx.draw_networkx_nodes(G, layout, node_size=node_size,
-                               node_color="lightgray", edgecolors="black")
-        nx.draw_networkx_edges(G, layout, width=width, edge_color=edge_colors)
-        nx.draw_networkx_labels(G, layout)
+        ax.scatter(node_xy[:, 0], node_xy[:, 1], s=node_size, c="lightgray",
+                   edgecolors="black", zorder=2)
+        nx.draw_networkx_edges(G, layout, edgelist=edges, width=width, edge_color=edge_colors,
+                               ax=ax)
+        for x, y, text in node_labels:
+            ax.text(x, y, text, size=12, ha="center", va="center", clip_on=True)
 
         ax.axis("off")
 
@@ -369,7 +665,10 @@ def draw_all_edge_colorings(G, solutions, node_size=600, width=3, layout=None):
     for ax in axes[len(solutions):]:
         ax.axis("off")
 
-    plt.tight_layout()
+    # Fixed spacing, leaving about 0.3in above each row for its title;
+    # cheaper than rerunning the tight_layout solver.
+    fig.subplots_adjust(left=0.01, right=0.99, bottom=0.01, top=1 - 0.3 / (4 * rows),
+                        wspace=0.05, hspace=0.1)
 
 def read_graph_json(path):
     """
@@ -443,6 +742,9 @@ def draw_bipartite_edgecolor_grid(G, U, V, coloring, ax=None,
     coloring : dict
         Edge->color mapping, e.g. solutions[k] from the solver.
     """
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import Rectangle
+
     if ax is None:
         fig, ax = plt.subplots(figsize=(max(6, 0.6*len(V)), max(6, 0.6*len(U))))
 
@@ -502,6 +804,22 @@ class EdgeColoringInstance:
             self.U = sorted(list(U))
             self.V = sorted(list(V))
 
+        # Graph structure reused by every solve and draw
+        self._edges = list(G.edges())
+        self._edge_index = {e: k for k, e in enumerate(self._edges)}
+        self._deg = dict(G.degree())
+        self._node_idx = {v: i for i, v in enumerate(G.nodes())}
+        self.colors = sorted(set().union(*map(set, vertex_colors.values())))
+        self._color_id = {c: i for i, c in enumerate(self.colors)}
+        self._color_map = None  # built on first draw; needs matplotlib
+
+        if self.bipartite:
+            # Edge index behind each cell of the bipartite grid, -1 if no edge
+            def grid_edge(u, v):
+                return self._edge_index.get((u, v), self._edge_index.get((v, u), -1))
+            self._grid_edge_index = np.array([[grid_edge(u, v) for v in self.V] for u in self.U],
+                                             dtype=np.intp).reshape(len(self.U), len(self.V))
+
     @classmethod
     def from_json(cls, path, layout=None):
         """
@@ -517,9 +835,23 @@ class EdgeColoringInstance:
         G, vertex_colors, layout_dict = read_graph_json(path)
         return cls(G, vertex_colors, layout_dict)
 
-    def solve(self):
-        """Return all valid edge colorings satisfying the vertex constraints."""
-        return all_edge_colorings_with_vertex_constraints(self.G, self.vertex_colors)
+    def solve(self, use_numba=False, canonical=False):
+        """Return all valid edge colorings satisfying the vertex constraints.
+
+        With canonical=True, return one coloring per color permutation class
+        (see all_edge_colorings_with_vertex_constraints)."""
+        return all_edge_colorings_with_vertex_constraints(self.G, self.vertex_colors,
+                                                          use_numba=use_numba,
+                                                          edges=self._edges, deg=self._deg,
+                                                          node_idx=self._node_idx,
+                                                          canonical=canonical, specialize=True)
+
+    def solve_packed(self, canonical=False):
+        """Return (bits, edges, colors) from all_edge_colorings_packed, in the
+        same order as solve()."""
+        return all_edge_colorings_packed(self.G, self.vertex_colors,
+                                         edges=self._edges, deg=self._deg,
+                                         node_idx=self._node_idx, canonical=canonical)
 
     def draw_coloring(self, solution, **kwargs):
         """
@@ -528,7 +860,8 @@ class EdgeColoringInstance:
         Extra kwargs are passed to draw_edge_coloring, e.g.
         node_size=..., width=...
         """
-        draw_edge_coloring(self.G, solution, layout=self.layout, **kwargs)
+        draw_edge_coloring(self.G, solution, layout=self.layout, edges=self._edges,
+                           color_map=self._get_color_map(), **kwargs)
 
     def draw_colorings(self, solutions=None, **kwargs):
         """
@@ -538,7 +871,14 @@ class EdgeColoringInstance:
         """
         if solutions is None:
             solutions = self.solve()
-        draw_all_edge_colorings(self.G, solutions, layout=self.layout, **kwargs)
+        draw_all_edge_colorings(self.G, solutions, layout=self.layout, edges=self._edges,
+                                color_map=self._get_color_map(), **kwargs)
+
+    def _get_color_map(self):
+        """The palette is fixed by the constraints, so map it once per instance."""
+        if self._color_map is None:
+            self._color_map = _edge_color_map(self.colors)
+        return self._color_map
 
     def draw_latex(self, solution, **kwargs):
         """
@@ -548,6 +888,15 @@ class EdgeColoringInstance:
         node_style=.., edge_style=..
         """
         return tikz_from_coloring(self.G, solution, layout=self.layout, **kwargs)
+
+    def vectorize_solutions(self, sols):
+        """
+        Return an (n, m) int32 array whose row i lists the color ids of
+        sols[i], one column per edge in G.edges() order.  Color ids index
+        self.colors, the sorted list of all constraint colors.
+        """
+        return np.array([[self._color_id[s[e]] for e in self._edges] for s in sols],
+                        dtype=np.int32).reshape(len(sols), len(self._edges))
         
     def get_bipartite_grid(self, solution):
         assert(self.bipartite)
@@ -561,6 +910,16 @@ class EdgeColoringInstance:
 
         return [[get_edge_color(u,v) for v in self.V] for u in self.U]
 
+    def get_bipartite_grids_batch(self, sols):
+        """
+        Return the bipartite grids of all of sols as one (n, |U|, |V|) int8
+        array of color ids (indexing self.colors), -1 where there is no edge.
+        """
+        assert(self.bipartite)
+        ids = self.vectorize_solutions(sols)
+        idx = self._grid_edge_index
+        return np.where(idx >= 0, ids[:, idx], -1).astype(np.int8)
+
         
     def draw_bipartite_grid(self, solution, **kwargs):
         """
@@ -579,24 +938,89 @@ def is_colortrade(s1,s2):
     Return True if all edges are different colors, so this is a color trade.
     False if they share any edge color.
     """
-    for edge, color in s1.items():
-        if s2[edge] == color:
-            return False
-    return True
+    return all(s2[edge] != color for edge, color in s1.items())
+
+def is_colortrade_vec(t1, t2):
+    """Like is_colortrade, for colorings given as tuples of colors (or
+    color ids) in a common edge order, e.g. rows of vectorize_solutions().
+    """
+    return all(a != b for a, b in zip(t1, t2))
+
+def pack_solutions(sols, edges=None):
+    """
+    Pack solutions into bit-vectors for fast trade testing.
+
+    Returns an (n, nwords) uint64 array in which bit k*C + c of row i is set
+    iff edge k has color id c in sols[i] (C = number of distinct colors,
+    nwords = ceil(m*C / 64)).  Two rows share an edge color exactly when
+    their bitwise AND is nonzero.
 
-def build_trade_graph(sols):
-    """Build a graph showing which solutions are color-trades"""
+    edges fixes the edge order; by default it is the key order of sols[0].
+    """
+    if edges is None:
+        edges = list(sols[0]) if sols else []
+    colors = sorted({c for s in sols for c in s.values()})
+    color_id = {c: i for i, c in enumerate(colors)}
+    M = np.array([[color_id[s[e]] for e in edges] for s in sols],
+                 dtype=np.int64).reshape(len(sols), len(edges))
+    C = max(len(color_id), 1)
+    nwords = (len(edges) * C + 63) // 64
+
+    pos = np.arange(len(edges)) * C + M
+    bits = np.zeros((len(sols), nwords), dtype=np.uint64)
+    rows = np.broadcast_to(np.arange(len(sols))[:, None], pos.shape)
+    np.bitwise_or.at(bits, (rows, pos // 64), np.left_shift(np.uint64(1), (pos % 64).astype(np.uint64)))
+    return bits
+
+def build_trade_graph(sols, edges=None, block=512):
+    """Build a graph showing which solutions are color-trades.
+
+    Each solution is packed into a bit-vector (see pack_solutions), so
+    testing a pair is a word-wise AND: i and j trade exactly when no word
+    of bits[i] & bits[j] is nonzero.  Pairs i < j are compared in
+    block x block tiles, so the temporary AND array has at most
+    block**2 * nwords words however many solutions there are.
+
+    edges fixes the edge order; by default it is the key order of sols[0].
+    sols may also be an already packed 2-D uint64 array, as returned by
+    all_edge_colorings_packed or pack_solutions.  Other arrays, such as the
+    color-id matrix from vectorize_solutions, raise TypeError.
+    """
+    if isinstance(sols, np.ndarray) and (sols.dtype != np.uint64 or sols.ndim != 2):
+        raise TypeError("build_trade_graph needs a packed 2-D uint64 array "
+                        "(from all_edge_colorings_packed or pack_solutions), "
+                        f"got {sols.ndim}-D {sols.dtype}")
     G = nx.Graph()
     n = len(sols)
     G.add_nodes_from(range(n))
-    
-    for i, j in combinations(range(n), 2):
-        if is_colortrade(sols[i], sols[j]):
-            G.add_edge(i, j)
-            
+    if n < 2:
+        return G
+
+    bits = sols if isinstance(sols, np.ndarray) else pack_solutions(sols, edges)
+    pairs_i = []
+    pairs_j = []
+    for i0 in range(0, n, block):
+        rows = bits[i0:i0 + block]
+        # only tiles on or above the diagonal hold pairs i < j
+        for j0 in range(i0, n, block):
+            trade = ~(rows[:, None, :] & bits[None, j0:j0 + block, :]).any(axis=2)
+            if j0 == i0:
+                trade = np.triu(trade, k=1)
+            i_idx, j_idx = np.nonzero(trade)
+            pairs_i.append(i_idx + i0)
+            pairs_j.append(j_idx + j0)
+
+    # add the edges in row-major order, as a full scan would find them
+    i_idx = np.concatenate(pairs_i)
+    j_idx = np.concatenate(pairs_j)
+    order = np.lexsort((j_idx, i_idx))
+    G.add_edges_from(zip(i_idx[order].tolist(), j_idx[order].tolist()))
+
     return G
     
 if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+
     # create explicitly
     hexagon = EdgeColoringInstance(nx.cycle_graph(6),
                                   {0: ['red', 'blue'],
@@ -3,9 +3,8 @@ Look for Braille in k3,4
 """
 
 from __future__ import annotations
-from typing import List, Optional, Sequence, Tuple
-import collections
 import itertools
+import numpy as np
 import colortrade_tools as ct
 
 # Standard (uncontracted) Braille: dots 1–6 map to a 2x3 cell like:
@@ -51,87 +50,71 @@ BRAILLE_LETTER_TO_DOTS = {
     "z": {1, 3, 5, 6},
 }
 
-# Invert: dots -> letter
-BRAILLE_DOTS_TO_LETTER = {frozenset(v): k for k, v in BRAILLE_LETTER_TO_DOTS.items()}
-
-
-def _validate_4x3_bool_grid(grid: Sequence[Sequence[bool]]) -> None:
-    if len(grid) != 3:
-        raise ValueError(f"Expected 3 rows, got {len(grid)}")
-    for r, row in enumerate(grid):
-        if len(row) != 4:
-            raise ValueError(f"Row {r} expected 4 columns, got {len(row)}")
-        if not all(isinstance(x, (bool, int)) for x in row):
-            raise TypeError("Grid entries must be booleans (or 0/1).")
-
-
-def _subcell_to_letter(sub: Sequence[Sequence[bool]]) -> Optional[str]:
-    """
-    sub is a 3x2 boolean grid (rows 0..2, cols 0..1).
-    Returns 'a'..'z' if it matches a standard Braille letter, else None.
-    """
-    # Compute raised dot set based on DOT_POS mapping.
-    raised = set()
-    for dot, (rr, cc) in DOT_POS.items():
-        if bool(sub[rr][cc]):
-            raised.add(dot)
-    return BRAILLE_DOTS_TO_LETTER.get(frozenset(raised))
-
-
-def braille_pair_from_4x3(grid: Sequence[Sequence[bool]]) -> Tuple[Optional[str], Optional[str]]:
-    """
-    Input: 3 lists of 4 booleans (a 3x4 grid).
-    Interprets it as two adjacent Braille cells (each 3x2),
-    and returns (left_letter_or_None, right_letter_or_None).
-    """
-    _validate_4x3_bool_grid(grid)
-
-    left = [row[0:2] for row in grid]   # 3x2
-    right = [row[2:4] for row in grid]  # 3x2
-
-    return _subcell_to_letter(left), _subcell_to_letter(right)
+# Vectorized lookup: a 3x2 cell packs into a 6-bit mask with dot d at bit d-1,
+# and LETTER_LUT[mask] is its letter ('' if none).
+DOT_WEIGHT = np.zeros((3, 2), dtype=np.int64)
+for dot, (rr, cc) in DOT_POS.items():
+    DOT_WEIGHT[rr, cc] = 1 << (dot - 1)
+LETTER_LUT = np.full(64, '', dtype='U1')
+for letter, dots in BRAILLE_LETTER_TO_DOTS.items():
+    LETTER_LUT[sum(1 << (d - 1) for d in dots)] = letter
 
 k34 = ct.EdgeColoringInstance.from_json("graphs/k34.json")
 sols = k34.solve()
+
+# All 16 sets of colors to turn on, and a (16, 4) membership table over 'bgor'
+COLOR_IDS = {c: i for i, c in enumerate('bgor')}
+ONSETS = [onset for colors_on in range(5) for onset in itertools.combinations('bgor', colors_on)]
+subs = np.zeros((len(ONSETS), 4), dtype=bool)
+for k, onset in enumerate(ONSETS):
+    subs[k, [COLOR_IDS[c] for c in onset]] = True
+
+# Every solution's grid as ids into 'bgor', shape (n_sols, 3, 4)
+to_bgor = np.array([COLOR_IDS[c[0]] for c in k34.colors], dtype=np.int8)
+G_all = to_bgor[k34.get_bipartite_grids_batch(sols)]
+
+# color_masks[i, c, side] is the 6-bit dot mask raised in the left (side 0)
+# or right (side 1) cell of solution i when only color c is on.
+one_color = (G_all[:, None, :, :] == np.arange(4)[None, :, None, None])
+one_color = one_color.reshape(len(sols), 4, 3, 2, 2)
+color_masks = (one_color * DOT_WEIGHT[:, None, :]).sum(axis=(2, 4)).astype(np.uint8)
+
+# Turning on a set of colors raises the union of their dots, so each cell's
+# mask for ONSETS[k] is an OR of color masks; shape (16, n_sols, 2).
+masks = np.bitwise_or.reduce(np.where(subs[:, None, :, None], color_masks[None], 0), axis=2)
+letters = LETTER_LUT[masks]
+left, right = letters[..., 0], letters[..., 1]
+
 pairs = set()
 OOlist = []
 ZElist = []
-for i,s in enumerate(sols):
-    g = k34.get_bipartite_grid(s)
-
-    for colors_on in range(5):
-        for onset in itertools.combinations('bgor',colors_on):
-            bit = collections.defaultdict(int)
-            for c in onset:
-                bit[c] = 1
-
-            bitgrid = [[bit[c[0]] for c in r] for r in g]
-            (llet,rlet) = braille_pair_from_4x3(bitgrid)
-            if llet is not None and rlet is not None:
-                print(f'solution {i}: {llet} {rlet} using {str(onset)}')
-                pairs.add(llet + rlet)
-                if llet + rlet == 'oo':
-                    OOlist.append(i)
-                if llet + rlet == 'ze':
-                    ZElist.append(i)
+for i, k in np.argwhere(((left != '') & (right != '')).T).tolist():
+    llet, rlet, onset = str(left[k, i]), str(right[k, i]), ONSETS[k]
+    print(f'solution {i}: {llet} {rlet} using {str(onset)}')
+    pairs.add(llet + rlet)
+    if llet + rlet == 'oo':
+        OOlist.append(i)
+    if llet + rlet == 'ze':
+        ZElist.append(i)
     
 for p in pairs:
     print(p,end=' ')
 print()
 
 
+# Find all trades once, then just look them up
+tg = ct.build_trade_graph(sols)
+
 print('OO grids')
 for i in OOlist: # oo
-    for j in range(len(sols)):
-        if ct.is_colortrade(sols[i],sols[j]):
-            print(i,'trades with',j)
+    for j in sorted(tg.neighbors(i)):
+        print(i,'trades with',j)
 
 print()
 print('ZE grids')
 for i in ZElist: # ze
-    for j in range(len(sols)):
-        if ct.is_colortrade(sols[i],sols[j]):
-            print(i,'trades with',j)
+    for j in sorted(tg.neighbors(i)):
+        print(i,'trades with',j)
 
 print()
 print('Solution 15')
@@ -3,9 +3,11 @@ Look for Braille in k6
 """
 
 from __future__ import annotations
-from typing import List, Optional, Sequence, Tuple
+import argparse
 import collections
 import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import colortrade_tools as ct
 
 # Standard (uncontracted) Braille: dots 1–6 map to a 2x3 cell like:
@@ -51,187 +53,133 @@ BRAILLE_LETTER_TO_DOTS = {
     "z": {1, 3, 5, 6},
 }
 
-# Invert: dots -> letter
-BRAILLE_DOTS_TO_LETTER = {frozenset(v): k for k, v in BRAILLE_LETTER_TO_DOTS.items()}
-
-def cell_to_letter(sub: Sequence[Sequence[bool]]) -> Optional[str]:
+# Dense lookup: a cell packed into 6 bits (bit i set if dot i+1 is raised)
+# -> letter, or None
+CELL_LUT = [None]*64
+for _letter, _dots in BRAILLE_LETTER_TO_DOTS.items():
+    CELL_LUT[sum(1 << (dot - 1) for dot in _dots)] = _letter
+
+# Weight of each position of the 6x6 grid within its cell's index,
+# so summing weights*bits over a cell gives the CELL_LUT index.
+DOT_WEIGHT = np.zeros((3, 2), dtype=np.uint8)
+for dot, (rr, cc) in DOT_POS.items():
+    DOT_WEIGHT[rr, cc] = 1 << (dot - 1)
+GRID_WEIGHT = np.tile(DOT_WEIGHT, (2, 3))
+
+# CELL_LUT as letter ids 0..25, -1 for no letter; LETTER_BYTES[-1] is '.'
+CELL_LUT_IDS = np.array([-1 if letter is None else ord(letter) - ord('a')
+                         for letter in CELL_LUT], dtype=np.int8)
+LETTER_BYTES = np.frombuffer(b'abcdefghijklmnopqrstuvwxyz.', dtype=np.uint8)
+
+def scan_masks(grid_ids, num_colors, use_numba=False):
     """
-    sub is a 3x2 boolean grid (rows 0..2, cols 0..1).
-    Returns 'a'..'z' if it matches a standard Braille letter, else None.
+    Letter ids (as in CELL_LUT_IDS) of the six cells of a 6x6 grid of color
+    ids, for every mask of on colors: an int8 array of shape (2**num_colors, 6).
+    With use_numba, run the compiled kernel from _braille_numba instead; it
+    only pays off once its load time is spread over many squares.
     """
-    # Compute raised dot set based on DOT_POS mapping.
-    raised = set()
-    for dot, (rr, cc) in DOT_POS.items():
-        if bool(sub[rr][cc]):
-            raised.add(dot)
-    return BRAILLE_DOTS_TO_LETTER.get(frozenset(raised))
-
-class BitGrid():
-    def __init__(self, bits):
-        self.bits = bits
+    if use_numba:
+        try:
+            from _braille_numba import scan_masks as _scan_masks_numba
+        except ImportError:
+            raise ImportError("use_numba=True requires numba")
+        return _scan_masks_numba(grid_ids, num_colors, CELL_LUT_IDS)
+    masks = np.arange(1 << num_colors)
+    bits = ((1 << grid_ids.astype(np.int64)) & masks[:, None, None]) != 0
+    cells = (GRID_WEIGHT * bits).reshape(-1, 2, 3, 3, 2).sum(axis=(2, 4))
+    return CELL_LUT_IDS[cells.reshape(-1, 6)]
 
-    def __str__(self):
-        out = ''
-        for r in self.bits:
-            for c in r:
-                out += '*' if c else '.'
-            out += '\n'
-        return out
-
-    def to_Braille(self):
-        count = 0
-        out = ''
-        for r in [0,3]:
-            for c in [0,2,4]:
-                subgrid = [lines[c:c+2] for lines in self.bits[r:r+3]]
-                letter = cell_to_letter(subgrid)
-                if letter is None:
-                    letter = '.'
-                else:
-                    count += 1
-                out += letter
-        return out, count
-                
 class K6LatinSquare():
-    def __init__(self, coloring):
+    def __init__(self, coloring, use_numba=False):
+        self.use_numba = use_numba
+        self.colors = set(coloring.values())
+        # Color i of colors_t has id i; grid_ids is the grid of color ids.
+        self.colors_t = tuple(sorted(self.colors))
+        color_id = {c: i for i, c in enumerate(self.colors_t)}
+        all_mask = (1 << len(self.colors_t)) - 1
+
         self.grid = [[None]*6 for i in range(6)]
+        self.grid_ids = np.zeros((6, 6), dtype=np.uint8)
+        row_mask = [0]*6
         for (x,y),color in coloring.items():
             x = int(x)
             y = int(y)
             self.grid[x][y] = color
             self.grid[y][x] = color
-        
-        self.colors = set(coloring.values())
+            cid = color_id[color]
+            self.grid_ids[x, y] = self.grid_ids[y, x] = cid
+            row_mask[x] |= 1 << cid
+            row_mask[y] |= 1 << cid
+
         for i in range(6):
             # fill the diagonal with the missing color from the row
-            [self.grid[i][i]] = self.colors.difference(set(self.grid[i]))
-
-    def to_binary(self, on_colors): 
-        """Convert from a grid of colors to a binary grid,
-        with 1 for the on_colors and 0 otherwise."""
-        assert(set(on_colors).issubset(self.colors))
-        return BitGrid([[(1 if c in on_colors else 0) for c in r] for r in self.grid])
+            missing = all_mask ^ row_mask[i]
+            assert missing and missing & (missing - 1) == 0
+            cid = missing.bit_length() - 1
+            self.grid[i][i] = self.colors_t[cid]
+            self.grid_ids[i, i] = cid
+
+        self._ids = None
+        self._braille = None
+        self._letters = None
+
+    def mask_colors(self, on_mask):
+        """The tuple of colors whose id is set in on_mask."""
+        return tuple(c for i, c in enumerate(self.colors_t) if on_mask >> i & 1)
+
+    def letter_ids(self):
+        """scan_masks of the grid: letter id of each cell under every color mask."""
+        if self._ids is None:
+            self._ids = scan_masks(self.grid_ids, len(self.colors_t), self.use_numba)
+        return self._ids
+
+    def braille_table(self):
+        """
+        For every color mask, (letters, count): the six cells' letters read
+        across the top row and then the bottom, with '.' for a cell that
+        shows no letter, and the number of cells that show one.  Built once
+        from letter_ids().
+        """
+        if self._braille is None:
+            ids = self.letter_ids()
+            # One ASCII buffer holding every row's six letters back to back
+            text = LETTER_BYTES[ids].tobytes().decode('ascii')
+            results = [text[i:i+6] for i in range(0, len(text), 6)]
+            counts = (ids >= 0).sum(axis=1).tolist()
+            self._braille = list(zip(results, counts))
+        return self._braille
+
+    def letters_by_cell(self):
+        """
+        For each of the six cells, a dict mapping each letter the cell can show
+        to the list of (number of colors on, mask) that show it, fewest colors first.
+        """
+        if self._letters is None:
+            self._letters = [collections.defaultdict(list) for i in range(6)]
+            for mask, (result, count) in enumerate(self.braille_table()):
+                for i, c in enumerate(result):
+                    if c != '.':
+                        self._letters[i][c].append((bin(mask).count('1'), mask))
+            for cell in self._letters:
+                for entries in cell.values():
+                    entries.sort()
+        return self._letters
 
     def __str__(self):
-        out = ''
-        for r in self.grid:
-            for c in r:
-                out += c[0:3] + ' '
-            out += '\n'
-        return out
-    
-k6 = ct.EdgeColoringInstance.from_json("graphs/k6.json")
-sols = k6.solve()
-
-#print(cell_to_letter([[1,1],[0,1],[1,0]]))
-
-full_braille = collections.defaultdict(set)
-half_braille = collections.defaultdict(set)
-six_braille = collections.defaultdict(set)
-
-for col_no, coloring in enumerate(sols):
-    tops = set()
-    bottoms = set()
-    letters = [set() for x in range(6)]
-    
-    g = K6LatinSquare(coloring)
-    for numcolors in range(7):
-        for c_on in itertools.combinations(g.colors,numcolors):
-            bits = g.to_binary(c_on)
-            result, count = bits.to_Braille()
-            if count == 6:
-                full_braille[result].add((col_no,c_on))
-            if result[0:3].find('.') == -1:
-                tops.add(result[0:3])
-            if result[3:6].find('.') == -1:
-                bottoms.add(result[3:6])
-
-            for i,c in enumerate(result):
-                if c != '.':
-                    letters[i].add(c)
-                    
-    for t in tops:
-        for b in bottoms:
-            half_braille[t + b].add(col_no)
-
-    all_letters = [''.join(sorted(list(letters[x]))) for x in range(6)]
-    if '' in all_letters:
-        print(col_no,'failed entirely') # never happens!
-    else:
-        six_braille['-'.join(all_letters)].add(col_no)
-    
-print('='*80)
-print('Possible solutions using one set of colors in all six cells')
-print('='*80)
-
-for k in full_braille:
-    for (i,c_on) in full_braille[k]:
-        print(i,end=',')
-    print()
-    print(k)
-
-print()
-print('='*80)
-print('Possible solutions using one set of colors for the top row, and a second set for the bottom row')
-print('='*80)
-for k in sorted(list(half_braille)):
-    print(k)
-#    print('using coloring numbers:')
-#    for i in half_braille[k]:
-#        print(i,end=',')
-#    print()
-
-    
-# Let's get some words!
-dfile = "words-with-6-letters.txt"
-dictionary = [x.strip() for x in open(dfile).readlines()]
-
-good_words = ['iguana','option','ethnic','gunman','sonata','zinnia','erotic','grotto','geneva','seneca','zydeco']
-
-print()
-print('='*80)
-print('Using different colorings for each 2x3 cell:')
-print('all possible letters in each cell and words made from those')
-print('='*80)
-
-possible_solutions = set()
-for k in six_braille:
-    print()
-    print(k)
-    for i in six_braille[k]:
-        print(i,end=',')
-    print()
-    spots = k.split('-')
-    for w in dictionary:
-        good = True
-        for i,c in enumerate(w):
-            if c not in spots[i]:
-                good = False
-                break
-        if good:
-            print(w)
-            possible_solutions.add(w)
+        return '\n'.join(' '.join(c[0:3] for c in row) + ' ' for row in self.grid) + '\n'
 
-    
 def colors(square, word):
     """Iterator through the color lists needed to match the six letter word"""
+    letters = square.letters_by_cell()
     for i in range(6):
-        for numcolors in range(7):
-            for c_on in itertools.combinations(g.colors,numcolors):
-                bits = square.to_binary(c_on)
-                result, count = bits.to_Braille()
-                if result[i] == word[i]:
-                    yield((i,c_on))
+        for (numcolors, mask) in letters[i].get(word[i], []):
+            yield((i,square.mask_colors(mask)))
 
 def mincolors(square,word):
-    best = {}
-    for (i,c_on) in colors(square,word):
-        if i not in best:
-            best[i] = c_on
-        else:
-            if len(c_on) < len(best[i]):
-                best[i] = c_on
-    return best
+    """For each cell that can show its letter of word, the fewest colors that do."""
+    letters = square.letters_by_cell()
+    return {i: square.mask_colors(letters[i][word[i]][0][1])
+            for i in range(6) if word[i] in letters[i]}
 
 def is_two_colors(square, word):
     bestcolors = mincolors(square,word)
@@ -243,59 +191,194 @@ def is_two_colors(square, word):
 
 def has_one_color_on(square, word):
     """Test if a word can be done including a single always-on color."""
-    works = {}
-    for c in square.colors:
-        works[c] = [False]*6
-
-    for (i,col_on) in colors(square,word):
-        for c in square.colors:
-            if c in col_on:
-                works[c][i] = True
-
-    result = []
-    for c in square.colors:
-        if all(works[c]):
-            result.append(c)
-
-    return result
-
-print()
-print('='*80)
-print('Which colorings to use for each word solution')
-print('including: if there is a color that is ON for all six cells')
-print('and if the word can be realized with only two colors per cell')
-print('='*80)
-
-#for (i,col_on) in colors(K6LatinSquare(sols[129]),"geneva"):
-#    print(i,col_on)
-
-for word in sorted(list(possible_solutions)):
-    print(word)
-    this_word_sols = []
-    for i,coloring in enumerate(sols):
-        square = K6LatinSquare(coloring)
-        if len(mincolors(square,word)) == 6:
-            this_word_sols.append(i)
-            if is_two_colors(square, word):
-                print('  on solution',i,'can be done with two colors per cell')
-            clist = has_one_color_on(square, word)
-            if clist:
-                print('  on solution',i,'has full color on:',clist)
-    print('   all sols:', ', '.join([str(j) for j in this_word_sols]))
-
-print()
-print()
-print('='*80)
-print('Possible color usage, per cell, for selected words')
-print('='*80)
-
-puzzle_words = ['seneca','grotto','gunman','option']
-for word in puzzle_words:
+    # Colors that are on in some mask showing the right letter, in every cell
+    letters = square.letters_by_cell()
+    works = (1 << len(square.colors_t)) - 1
+    for i in range(6):
+        used = 0
+        for (numcolors, mask) in letters[i].get(word[i], []):
+            used |= mask
+        works &= used
+
+    return list(square.mask_colors(works))
+
+def letter_mask(letters):
+    """26-bit mask with bit i set if the i-th letter of the alphabet is in letters."""
+    mask = 0
+    for c in letters:
+        mask |= 1 << (ord(c) - ord('a'))
+    return mask
+
+def analyze_square(col_no, square):
+    """
+    Braille found in one coloring's square, as (full, half, six):
+      full: dict of six-letter strings made with one set of colors on,
+            each mapped to the list of (col_no, colors on)
+      half: set of strings made with one set of colors on the top row
+            and another on the bottom row
+      six:  the letters possible in each cell, joined with '-', or None
+            if some cell can't show any letter
+    """
+    full = collections.defaultdict(list)
+    tops = set()
+    bottoms = set()
+
+    for mask, (result, count) in enumerate(square.braille_table()):
+        c_on = square.mask_colors(mask)
+        if count == 6:
+            full[result].append((col_no,c_on))
+        top3 = result[:3]
+        bot3 = result[3:]
+        if '.' not in top3:
+            tops.add(top3)
+        if '.' not in bot3:
+            bottoms.add(bot3)
+
+    half = {t + b for t in tops for b in bottoms}
+
+    # Letters each cell shows under some mask; ids sort alphabetically
+    all_letters = [LETTER_BYTES[np.unique(col[col >= 0])].tobytes().decode('ascii')
+                   for col in square.letter_ids().T]
+    six = None if '' in all_letters else '-'.join(all_letters)
+    return full, half, six
+
+def analyze_coloring(col_no, coloring, use_numba=False):
+    """analyze_square for a coloring of k6; used by the worker processes."""
+    return analyze_square(col_no, K6LatinSquare(coloring, use_numba))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Look for Braille in the colorings of k6.")
+    parser.add_argument("-workers",
+                        type=int,
+                        default=1,
+                        help="Number of processes to analyze the colorings with")
+    parser.add_argument("-numba",
+                        action="store_true",
+                        help="Decode the Braille cells with the numba kernel")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    workers = args.workers
+
+    k6 = ct.EdgeColoringInstance.from_json("graphs/k6.json")
+    sols = k6.solve()
+    squares = [K6LatinSquare(coloring, args.numba) for coloring in sols]
+
+    full_braille = collections.defaultdict(list)
+    half_braille = collections.defaultdict(set)
+    six_braille = collections.defaultdict(set)
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            results = list(ex.map(analyze_coloring, range(len(sols)), sols,
+                                  itertools.repeat(args.numba), chunksize=32))
+    else:
+        results = map(analyze_square, range(len(squares)), squares)
+
+    for col_no, (full, half, six) in enumerate(results):
+        for result, pairs in full.items():
+            full_braille[result].extend(pairs)
+        for word in half:
+            half_braille[word].add(col_no)
+        if six is None:
+            print(col_no,'failed entirely') # never happens!
+        else:
+            six_braille[six].add(col_no)
+
+    print('='*80)
+    print('Possible solutions using one set of colors in all six cells')
+    print('='*80)
+
+    for k in full_braille:
+        for (i,c_on) in full_braille[k]:
+            print(i,end=',')
+        print()
+        print(k)
+
+    print()
+    print('='*80)
+    print('Possible solutions using one set of colors for the top row, and a second set for the bottom row')
+    print('='*80)
+    for k in sorted(list(half_braille)):
+        print(k)
+    #    print('using coloring numbers:')
+    #    for i in half_braille[k]:
+    #        print(i,end=',')
+    #    print()
+
+
+    # Let's get some words!
+    dfile = "words-with-6-letters.txt"
+    with open(dfile) as f:
+        dictionary = tuple(w for w in (line.strip().lower() for line in f)
+                           if len(w) == 6 and w.isascii() and w.isalpha())
+
+    # word_bits[j, i] has just the bit of the i-th letter of dictionary[j]
+    word_bits = np.array([[letter_mask(c) for c in w] for w in dictionary], dtype=np.uint32)
+
+    good_words = ['iguana','option','ethnic','gunman','sonata','zinnia','erotic','grotto','geneva','seneca','zydeco']
+
     print()
-    print('-'*10,word,'-'*10)
-    for i,coloring in enumerate(sols):
-        square = K6LatinSquare(coloring)
-        if len(mincolors(square,word)) == 6:
+    print('='*80)
+    print('Using different colorings for each 2x3 cell:')
+    print('all possible letters in each cell and words made from those')
+    print('='*80)
+
+    possible_solutions = set()
+    for k in six_braille:
+        print()
+        print(k)
+        for i in six_braille[k]:
+            print(i,end=',')
+        print()
+        spots_mask = np.array([letter_mask(spot) for spot in k.split('-')], dtype=np.uint32)
+        for j in np.flatnonzero(np.all((word_bits & spots_mask) != 0, axis=1)):
+            w = dictionary[j]
+            print(w)
+            possible_solutions.add(w)
+
+    print()
+    print('='*80)
+    print('Which colorings to use for each word solution')
+    print('including: if there is a color that is ON for all six cells')
+    print('and if the word can be realized with only two colors per cell')
+    print('='*80)
+
+    #for (i,col_on) in colors(K6LatinSquare(sols[129]),"geneva"):
+    #    print(i,col_on)
+
+    word_to_sols = {}
+    for word in sorted(list(possible_solutions)):
+        print(word)
+        this_word_sols = word_to_sols[word] = []
+        for i,square in enumerate(squares):
+            if len(mincolors(square,word)) == 6:
+                this_word_sols.append(i)
+                if is_two_colors(square, word):
+                    print('  on solution',i,'can be done with two colors per cell')
+                clist = has_one_color_on(square, word)
+                if clist:
+                    print('  on solution',i,'has full color on:',clist)
+        print('   all sols:', ', '.join([str(j) for j in this_word_sols]))
+
+    print()
+    print()
+    print('='*80)
+    print('Possible color usage, per cell, for selected words')
+    print('='*80)
+
+    puzzle_words = ['seneca','grotto','gunman','option']
+    for word in puzzle_words:
+        print()
+        print('-'*10,word,'-'*10)
+        if word not in word_to_sols:
+            word_to_sols[word] = [i for i,square in enumerate(squares)
+                                  if len(mincolors(square,word)) == 6]
+        for i in word_to_sols[word]:
             print('COLORING',i)
-            for (spot, col_on) in colors(square,word):
+            for (spot, col_on) in colors(squares[i],word):
                 print(spot,col_on)
+
+if __name__ == "__main__":
+    main()
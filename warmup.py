@@ -5,6 +5,7 @@ import sys
 import colortrade_tools as ct
 import random
 import re
+from itertools import accumulate
 
 if len(sys.argv) == 1:
     printing_solution = False
@@ -47,6 +48,8 @@ frequencies = {
     'P': 1.66, 'B': 1.60, 'V': 1.06, 'K': 0.87, 'J': 0.23, 'X': 0.20,
     'Q': 0.09, 'Z': 0.06
 }
+LETTERS = tuple(frequencies.keys())
+CUM = tuple(accumulate(frequencies.values()))
 
 def get_random_letter_by_frequency():
     """
@@ -54,7 +57,15 @@ def get_random_letter_by_frequency():
     Returns a single-character string (uppercase).
     """
     # random.choices returns a list, so we take the first element
-    return random.choices(list(frequencies.keys()), weights=list(frequencies.values()), k=1)[0]
+    return random.choices(LETTERS, cum_weights=CUM, k=1)[0]
+
+# Patterns used by texit, compiled once
+COLOR_PAT = re.compile(r"(\w+)]")
+EDGE_PAT = re.compile(r"\((\w+)\) -- \((\w+)\)")
+NODE_LABEL_PAT = re.compile(r'{.};')
+COLOR_SUB_PAT = re.compile('color.')
+COLORNAME_PAT = re.compile('|'.join(re.escape(c) for c in colornames))
+COLORNAME_MAP = {c: f'color{i+1}' for i,c in enumerate(colornames)}
 
 def texit(g, c1, c2, letters, scale):
     global solutionletter
@@ -63,13 +74,12 @@ def texit(g, c1, c2, letters, scale):
     blanked = g.draw_latex(c2,scale=scale)
 
     # substitute color names
-    for i,color in enumerate(colornames):
-        original = original.replace(color,f'color{i+1}')
-        blanked = blanked.replace(color,f'color{i+1}')
+    original = COLORNAME_PAT.sub(lambda m: COLORNAME_MAP[m.group(0)], original)
+    blanked = COLORNAME_PAT.sub(lambda m: COLORNAME_MAP[m.group(0)], blanked)
 
     # remove node labels
-    original = re.sub(r'{.};',r'{};',original)
-    blanked = re.sub(r'{.};',r'{};',blanked)
+    original = NODE_LABEL_PAT.sub(r'{};',original)
+    blanked = NODE_LABEL_PAT.sub(r'{};',blanked)
     
     # Now handle the blanked out graph
     result = ''
@@ -81,16 +91,14 @@ def texit(g, c1, c2, letters, scale):
         else:
             # extract information from draw line
             # \draw[CTedge, color1] (v0) -- (v1);
-            pattern = r"(\w+)]"
-            color = re.search(pattern, line).group(1)
-            pattern = r"\((\w+)\) -- \((\w+)\)"
-            v0,v1 = re.search(pattern, line).groups()
+            color = COLOR_PAT.search(line).group(1)
+            v0,v1 = EDGE_PAT.search(line).groups()
 
             c = letters[edge]
             if c == '#':
                 out = line
             elif c in '123456':
-                out = re.sub('color.','color'+c, line)
+                out = COLOR_SUB_PAT.sub('color'+c, line)
             else:
                 v = c
                 if c == '?':